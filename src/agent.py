@@ -1,21 +1,34 @@
-"""Agent orchestrator — wires STT, LLM, and TTS into a pipeline."""
+"""Agent orchestrator — wires STT, LLM, and TTS into a pipeline.
 
+Each stage is exposed separately so a connection can run them as independent
+workers (see ``src.main``): while one turn's reply is still being spoken, the
+next turn can already be transcribed.
+"""
+
+import asyncio
 import logging
-from dataclasses import dataclass
-from typing import Optional
+from typing import Dict, List, Optional, Set, Tuple
+
+import numpy as np
 
-from src import stt, tts, llm, analysis
+from src import stt, tts, llm, analysis, cache
 from src.session import Session
 
 logger = logging.getLogger(__name__)
 
+# Always French
+_TTS_LANG = "fr"
+
+# A TTS chunk ends on terminal punctuation or a comma once it is long enough to
+# sound natural on its own (so "M." or "Dr." is never sent alone), or when the
+# buffer gets too long to wait.
+_SENTENCE_END = (".", "?", "!", "…")
+_CHUNK_END = _SENTENCE_END + (",",)
+_CLAUSE_MIN_WORDS = 4
+_MAX_CHUNK_WORDS = 80
 
-@dataclass
-class AgentResponse:
-    user_text: str
-    detected_language: str
-    response_text: str
-    audio_bytes: bytes
+# Strong references to fire-and-forget tasks so they aren't garbage-collected
+_background: Set[asyncio.Task] = set()
 
 
 def load_models():
@@ -27,52 +40,162 @@ def load_models():
     logger.info("All models loaded.")
 
 
-async def process_audio(audio_bytes: bytes, session: Session) -> Optional[AgentResponse]:
-    """Run the full voice agent pipeline.
+def start_speech() -> tts.ParallelTTS:
+    """Create the TTS queue a connection's replies are spoken through."""
+    return tts.ParallelTTS(language=_TTS_LANG)
+
+
+def _is_chunk_boundary(buffer: str) -> bool:
+    """Return True when the buffered LLM text should be sent to TTS."""
+    # Plain suffix checks: no regex scan over a buffer that grows per token
+    words = len(buffer.split())
+    if words >= _CLAUSE_MIN_WORDS and buffer.rstrip().endswith(_CHUNK_END):
+        return True
+    return words >= _MAX_CHUNK_WORDS
+
+
+def _is_speakable(text: str) -> bool:
+    """False for text that is only punctuation, e.g. a stray "." after a sent sentence."""
+    return any(c.isalnum() for c in text)
+
+
+def _last_sentence_break(token: str) -> int:
+    """Index just past the last sentence end inside ``token`` that more text follows, or -1."""
+    for i in range(len(token) - 2, -1, -1):
+        if token[i] in _SENTENCE_END and token[i + 1].isspace():
+            return i + 1
+    return -1
+
+
+def _last_reply(history: List[Dict[str, str]]) -> str:
+    """The assistant turn the next utterance answers, or "" on a first turn."""
+    return next((t["text"] for t in reversed(history) if t["role"] == "assistant"), "")
+
+
+async def _embed_utterance(user_text: str) -> Optional[np.ndarray]:
+    """Embed the utterance alone; its context is matched exactly on lookup instead."""
+    try:
+        return await cache.embed(user_text)
+    except Exception as e:
+        logger.warning("Cache embedding failed, skipping cache: %s", e)
+        return None
+
+
+def _cache_when_spoken(embedding: np.ndarray, language: str, context: str,
+                       response_text: str, tasks: List[asyncio.Task]):
+    """Insert the reply into the cache once all of its audio has been synthesized."""
+    async def _insert():
+        results = await asyncio.gather(*tasks, return_exceptions=True)
+        # Only complete replies are worth replaying
+        if not results or not all(isinstance(chunks, list) and chunks for chunks in results):
+            return
+        audio_chunks = [audio for chunks in results for audio in chunks]
+        cache.insert(embedding, cache.CachedReply(language, context, response_text, audio_chunks))
+
+    task = asyncio.create_task(_insert())
+    _background.add(task)
+    task.add_done_callback(_background.discard)
+
 
-    1. Transcribe audio (STT)
-    2. Generate response (LLM)
-    3. Synthesize speech (TTS)
+async def transcribe(audio: np.ndarray) -> Optional[Tuple[str, str]]:
+    """STT stage: transcribe the user's audio on the dedicated Whisper thread.
+
+    Whisper detects the language on every turn, so a user can switch between
+    English, French and Indonesian at any point.
 
     Args:
-        audio_bytes: WAV-format audio from the user's microphone.
-        session: The current conversation session.
+        audio: Mono 16 kHz float32 samples from the user's microphone.
 
     Returns:
-        AgentResponse with all results, or None if transcription was empty.
+        (user_text, detected_language), or None if nothing was said.
     """
-    # Step 1: Speech-to-Text
-    user_text, detected_lang = stt.transcribe(audio_bytes)
+    user_text, detected_lang = await stt.transcribe_pcm_async(audio)
 
     if not user_text.strip():
         logger.info("Empty transcription, skipping.")
         return None
-
-    # Record user turn
-    session.add_turn("user", user_text, detected_lang)
-
-    # Step 2: LLM response
-    response_text = llm.generate_response(
+    return user_text, detected_lang
+
+
+async def _respond(user_text: str, detected_lang: str, session: Session,
+                   history: List[Dict[str, str]], speech: tts.ParallelTTS) -> str:
+    """Body of :func:`respond`, run after the user turn is recorded."""
+    embedding = None
+    context = _last_reply(history)
+    if cache.should_consult(user_text):
+        embedding = await _embed_utterance(user_text)
+        hit = cache.lookup(embedding, detected_lang, context) if embedding is not None else None
+        if hit is not None:
+            for audio in hit.audio_chunks:
+                speech.submit_audio(audio)
+            session.add_turn("assistant", hit.response_text, _TTS_LANG)
+            # The live chat never saw this exchange; re-prime it next turn
+            session.gemini_chat = None
+            return hit.response_text
+
+    tasks: List[asyncio.Task] = []
+    parts: List[str] = []
+    buffer = ""
+    async for token in llm.stream_response(
         user_text=user_text,
-        conversation_history=session.get_history()[:-1],  # exclude current turn
+        session=session,
+        conversation_history=history,
         detected_language=detected_lang,
-    )
-
-    # Always French
-    tts_lang = "fr"
+    ):
+        parts.append(token)
+        # Streamed tokens often span sentences; send the finished ones right away,
+        # unless that would split off a fragment like "M." or a lone "."
+        cut = _last_sentence_break(token)
+        ready = buffer + token[:cut] if cut >= 0 else ""
+        if cut >= 0 and not _is_speakable(ready):
+            buffer = token[cut:]
+        elif cut >= 0 and len(ready.split()) >= _CLAUSE_MIN_WORDS:
+            tasks.append(speech.submit(ready.strip()))
+            buffer = token[cut:]
+        else:
+            buffer += token
+        if _is_chunk_boundary(buffer):
+            if _is_speakable(buffer):
+                tasks.append(speech.submit(buffer.strip()))
+            buffer = ""
+
+    if _is_speakable(buffer):
+        tasks.append(speech.submit(buffer.strip()))
+
+    response_text = "".join(parts).strip()
+    logger.info("LLM response [%s]: %s", detected_lang, response_text[:120])
 
     # Record assistant turn
-    session.add_turn("assistant", response_text, tts_lang)
+    session.add_turn("assistant", response_text, _TTS_LANG)
 
-    # Step 3: Text-to-Speech
-    audio = await tts.synthesize(response_text, tts_lang)
+    if embedding is not None:
+        _cache_when_spoken(embedding, detected_lang, context, response_text, tasks)
 
-    return AgentResponse(
-        user_text=user_text,
-        detected_language=detected_lang,
-        response_text=response_text,
-        audio_bytes=audio,
-    )
+    return response_text
+
+
+async def respond(user_text: str, detected_lang: str, session: Session,
+                  speech: tts.ParallelTTS) -> str:
+    """LLM stage: generate the reply to one user turn and speak it through ``speech``.
+
+    The LLM response is streamed and cut into sentence-sized chunks, each
+    submitted to TTS as soon as it is complete, so the first sentence is
+    being synthesized while the rest is still being generated. Short
+    utterances that closely match an earlier one in the same context replay
+    its cached reply and audio instead (see ``src.cache``). The turn is
+    marked ended on ``speech`` either way, even if generation fails.
+
+    Returns:
+        The full response text.
+    """
+    # Record user turn
+    history = session.get_history()
+    session.add_turn("user", user_text, detected_lang)
+
+    try:
+        return await _respond(user_text, detected_lang, session, history, speech)
+    finally:
+        speech.end_turn()
 
 
 def end_session(session: Session) -> dict:
@@ -1,15 +1,19 @@
 """End-of-conversation analysis: summary and sentiment."""
 
-import json
 import logging
+import re
 from typing import Dict, List
 
 import google.generativeai as genai
+import orjson
 
 from src import config
 
 logger = logging.getLogger(__name__)
 
+# Markdown code fences the model sometimes wraps its JSON in
+_FENCE_RE = re.compile(r"^\s*```(?:json)?\s*|\s*```\s*$")
+
 
 def analyze_conversation(history: List[Dict[str, str]]) -> Dict:
     """Generate summary and sentiment analysis for a conversation.
@@ -38,7 +42,7 @@ def analyze_conversation(history: List[Dict[str, str]]) -> Dict:
         }
 
     genai.configure(api_key=config.gemini_api_key())
-    model = genai.GenerativeModel(config.get("llm.model", "gemini-2.5-flash"))
+    model = genai.GenerativeModel(config.settings().llm_model)
 
     # Format the conversation transcript
     transcript_lines = []
@@ -68,22 +72,15 @@ TRANSCRIPT:
             ),
         )
 
-        raw = response.text.strip()
         # Strip markdown code fences if present
-        if raw.startswith("```"):
-            raw = raw.split("\n", 1)[1] if "\n" in raw else raw[3:]
-        if raw.endswith("```"):
-            raw = raw[:-3]
-        raw = raw.strip()
-        if raw.startswith("json"):
-            raw = raw[4:].strip()
-
-        result = json.loads(raw)
+        raw = _FENCE_RE.sub("", response.text).strip()
+
+        result = orjson.loads(raw)
         result["turn_count"] = len(history)
         logger.info("Analysis complete: %s", result.get("sentiment", {}).get("overall"))
         return result
 
-    except (json.JSONDecodeError, Exception) as e:
+    except (orjson.JSONDecodeError, Exception) as e:
         logger.error("Analysis failed: %s", e)
         return {
             "summary": "Analysis could not be completed.",
@@ -0,0 +1,104 @@
+"""Semantic response cache — reuses replies for near-duplicate utterances."""
+
+import logging
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import List, Optional
+
+import google.generativeai as genai
+import numpy as np
+
+from src import config
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class CachedReply:
+    language: str
+    context: str  # the assistant turn the utterance answered, "" on a first turn
+    response_text: str
+    audio_chunks: List[bytes]
+
+
+class SemanticCache:
+    """Cosine-similarity lookup over unit-normalised embeddings, with LRU eviction.
+
+    Embeddings live in one preallocated matrix; evicted rows are reused, so
+    the occupied rows are always ``[0, len(self))`` and a lookup is a single
+    matrix-vector product.
+    """
+
+    def __init__(self, max_entries: int, threshold: float):
+        self.max_entries = max_entries
+        self.threshold = threshold
+        self._vectors: Optional[np.ndarray] = None
+        self._replies: "OrderedDict[int, CachedReply]" = OrderedDict()  # row -> reply, oldest first
+
+    def __len__(self) -> int:
+        return len(self._replies)
+
+    def lookup(self, embedding: np.ndarray, language: str, context: str) -> Optional[CachedReply]:
+        """Return the closest reply above the threshold cached in the same context, or None."""
+        if not self._replies:
+            return None
+        sims = self._vectors[:len(self._replies)] @ embedding
+        for row in np.argsort(sims)[::-1]:
+            if sims[row] < self.threshold:
+                break
+            reply = self._replies[int(row)]
+            if reply.language == language and reply.context == context:
+                self._replies.move_to_end(int(row))
+                logger.info("Cache hit (similarity %.3f): %s", sims[row], reply.response_text[:80])
+                return reply
+        return None
+
+    def insert(self, embedding: np.ndarray, reply: CachedReply):
+        if self._vectors is None:
+            self._vectors = np.zeros((self.max_entries, embedding.shape[0]), dtype=np.float32)
+        if len(self._replies) >= self.max_entries:
+            row, _ = self._replies.popitem(last=False)
+        else:
+            row = len(self._replies)
+        self._vectors[row] = embedding
+        self._replies[row] = reply
+
+
+_cache: SemanticCache | None = None
+
+
+def _get_cache() -> SemanticCache:
+    global _cache
+    if _cache is None:
+        _cache = SemanticCache(
+            max_entries=config.get("cache.max_entries", 1024),
+            threshold=config.get("cache.similarity_threshold", 0.92),
+        )
+    return _cache
+
+
+def enabled() -> bool:
+    return config.settings().cache_enabled
+
+
+def should_consult(user_text: str) -> bool:
+    """Only short utterances repeat often enough to be worth an embedding call."""
+    return enabled() and len(user_text.split()) <= config.settings().cache_max_words
+
+
+async def embed(text: str) -> np.ndarray:
+    """Embed text with Gemini, returning a unit-length float32 vector."""
+    result = await genai.embed_content_async(
+        model=config.settings().cache_embedding_model,
+        content=text,
+    )
+    vector = np.asarray(result["embedding"], dtype=np.float32)
+    return vector / max(float(np.linalg.norm(vector)), 1e-12)
+
+
+def lookup(embedding: np.ndarray, language: str, context: str) -> Optional[CachedReply]:
+    return _get_cache().lookup(embedding, language, context)
+
+
+def insert(embedding: np.ndarray, reply: CachedReply):
+    _get_cache().insert(embedding, reply)
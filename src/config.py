@@ -1,4 +1,6 @@
+import functools
 import os
+from dataclasses import dataclass
 from pathlib import Path
 from typing import Any
 
@@ -34,6 +36,52 @@ def get(key: str, default: Any = None) -> Any:
     return data
 
 
+@dataclass(frozen=True, slots=True)
+class AgentConfig:
+    """Settings read on every turn, resolved once from agent.yaml."""
+
+    llm_model: str
+    llm_temperature: float
+    llm_max_output_tokens: int
+    llm_history_window: int
+    tts_model: str
+    tts_voice_name: str
+    tts_sample_rate: int
+    tts_concurrency: int
+    tts_cache_size: int
+    tts_cache_dir: Path | None
+    tts_cache_max_files: int
+    cache_enabled: bool
+    cache_max_words: int
+    cache_embedding_model: str
+
+
+@functools.lru_cache(maxsize=None)
+def settings() -> AgentConfig:
+    """Return the hot-path settings, parsed once and then reused."""
+    return AgentConfig(
+        llm_model=get("llm.model", "gemini-2.5-flash"),
+        llm_temperature=float(get("llm.temperature", 0.7)),
+        llm_max_output_tokens=int(get("llm.max_output_tokens", 512)),
+        llm_history_window=int(get("llm.history_window", 6)),
+        tts_model=get("tts.model", "gemini-2.5-flash-preview-tts"),
+        tts_voice_name=get("tts.voice_name", "Kore"),
+        tts_sample_rate=int(get("tts.sample_rate", 24000)),
+        tts_concurrency=int(get("tts.concurrency", 3)),
+        tts_cache_size=int(get("tts.cache_size", 512)),
+        tts_cache_dir=_optional_path(get("tts.cache_dir", "~/.cache/ai-live/tts")),
+        tts_cache_max_files=int(get("tts.cache_max_files", 1000)),
+        cache_enabled=bool(get("cache.enabled", False)),
+        cache_max_words=int(get("cache.max_words", 8)),
+        cache_embedding_model=get("cache.embedding_model", "models/text-embedding-004"),
+    )
+
+
+def _optional_path(value: str | None) -> Path | None:
+    return Path(value).expanduser() if value else None
+
+
+@functools.lru_cache(maxsize=None)
 def build_system_prompt() -> str:
     """Build the full system prompt from the agent config template."""
     cfg = _load()
@@ -58,6 +106,17 @@ def build_system_prompt() -> str:
     )
 
 
+def reload():
+    """Re-read agent.yaml on next access, dropping the cached settings and prompt.
+
+    Clients already built from the old values (the Gemini models) keep them.
+    """
+    global _config
+    _config = None
+    settings.cache_clear()
+    build_system_prompt.cache_clear()
+
+
 def gemini_api_key() -> str:
     key = os.environ.get("GEMINI_API_KEY", "")
     if not key:
@@ -1,22 +1,27 @@
 """LLM client using Google Gemini 2.5 Flash."""
 
+import functools
 import logging
-from typing import List, Dict
+from typing import Any, AsyncIterator, Dict, List
 
 import google.generativeai as genai
 
 from src import config
+from src.session import Session
 
 logger = logging.getLogger(__name__)
 
 _model = None
 
+# Always respond in French
+_LANGUAGE_PREFIX = "(IMPORTANT: You MUST respond in French regardless of the user's language.)\n"
+
 
 def _get_model():
     global _model
     if _model is None:
         genai.configure(api_key=config.gemini_api_key())
-        model_name = config.get("llm.model", "gemini-2.5-flash")
+        model_name = config.settings().llm_model
         logger.info("Initializing Gemini model: %s", model_name)
         _model = genai.GenerativeModel(
             model_name=model_name,
@@ -31,44 +36,87 @@ def load():
     _get_model()
 
 
-def generate_response(
+def _windowed(session: Session, history: List[Any]) -> List[Any]:
+    """Keep the last ``llm.history_window`` turns, led by the session summary if any."""
+    window = history[-2 * config.settings().llm_history_window:]
+    if session.summary:
+        window = [
+            {"role": "user", "parts": [f"(Summary of the earlier conversation: {session.summary})"]},
+            {"role": "model", "parts": ["Understood."]},
+        ] + window
+    return window
+
+
+def _get_chat(session: Session, conversation_history: List[Dict[str, str]]):
+    """Return the session's Gemini chat, starting one if it has none.
+
+    The chat is rebuilt from ``conversation_history`` when it is missing or
+    was created against a different model (e.g. the system prompt changed).
+    Either way its history is capped to a sliding window of recent turns, so
+    the prompt sent per turn stays bounded however long the session runs.
+    """
+    model = _get_model()
+    chat = session.gemini_chat
+    max_messages = 2 * config.settings().llm_history_window
+    if chat is None or chat.model is not model:
+        gemini_history = []
+        for turn in conversation_history:
+            role = "user" if turn["role"] == "user" else "model"
+            gemini_history.append({"role": role, "parts": [turn["text"]]})
+        chat = model.start_chat(history=_windowed(session, gemini_history))
+        session.gemini_chat = chat
+    elif len(chat.history) > max_messages:
+        chat.history = _windowed(session, chat.history)
+    return chat
+
+
+@functools.lru_cache(maxsize=None)
+def _generation_config(temperature: float, max_output_tokens: int) -> genai.types.GenerationConfig:
+    """Generation config for these settings, built once instead of per turn."""
+    return genai.types.GenerationConfig(temperature=temperature, max_output_tokens=max_output_tokens)
+
+
+async def stream_response(
     user_text: str,
+    session: Session,
     conversation_history: List[Dict[str, str]],
     detected_language: str = "en",
-) -> str:
-    """Generate a response from the LLM.
+) -> AsyncIterator[str]:
+    """Stream a response from the LLM as it is generated.
+
+    The session keeps one Gemini chat for its lifetime, so each turn only
+    sends the new message instead of rebuilding the whole history.
 
     Args:
         user_text: The user's transcribed speech.
-        conversation_history: List of {"role": "user"|"assistant", "text": "..."}.
+        session: The current conversation session (owns the Gemini chat).
+        conversation_history: Prior turns as {"role": "user"|"assistant", "text": "..."},
+            used only to prime a new chat.
         detected_language: Detected language code from STT.
 
-    Returns:
-        The model's response text.
+    Yields:
+        Text fragments of the model's response, in order.
     """
-    model = _get_model()
-    temperature = config.get("llm.temperature", 0.7)
-    max_tokens = config.get("llm.max_output_tokens", 512)
-
-    # Build Gemini conversation history
-    gemini_history = []
-    for turn in conversation_history:
-        role = "user" if turn["role"] == "user" else "model"
-        gemini_history.append({"role": role, "parts": [turn["text"]]})
-
-    chat = model.start_chat(history=gemini_history)
-
-    # Always respond in French
-    prefix = "(IMPORTANT: You MUST respond in French regardless of the user's language.)\n"
-
-    response = chat.send_message(
-        f"{prefix}{user_text}",
-        generation_config=genai.types.GenerationConfig(
-            temperature=temperature,
-            max_output_tokens=max_tokens,
-        ),
-    )
-
-    reply = response.text.strip()
-    logger.info("LLM response [%s]: %s", detected_language, reply[:120])
-    return reply
+    chat = _get_chat(session, conversation_history)
+    settings = config.settings()
+
+    try:
+        response = await chat.send_message_async(
+            f"{_LANGUAGE_PREFIX}{user_text}",
+            generation_config=_generation_config(settings.llm_temperature,
+                                                 settings.llm_max_output_tokens),
+            stream=True,
+        )
+
+        async for chunk in response:
+            # The final chunk may carry only a finish reason and no text parts
+            if not chunk.parts:
+                continue
+            if chunk.text:
+                yield chunk.text
+    except BaseException:
+        # A half-consumed stream leaves the chat unusable; rebuild it next turn
+        session.gemini_chat = None
+        raise
+
+    logger.info("LLM stream complete [%s]", detected_language)
@@ -1,19 +1,20 @@
 """FastAPI application — serves the web UI and WebSocket audio endpoint."""
 
+import asyncio
 import io
-import json
 import logging
-import subprocess
-import tempfile
 from contextlib import asynccontextmanager
 from pathlib import Path
 
+import av
+import numpy as np
+import orjson
 from fastapi import FastAPI, WebSocket, WebSocketDisconnect
 from fastapi.responses import HTMLResponse
 from fastapi.staticfiles import StaticFiles
 
-from src import agent
-from src.session import Session, create_session, get_session
+from src import agent, tts
+from src.session import Session, create_session, remove_session, sweep_sessions
 
 logging.basicConfig(
     level=logging.INFO,
@@ -24,13 +25,24 @@ logger = logging.getLogger(__name__)
 STATIC_DIR = Path(__file__).resolve().parent.parent / "static"
 
 
+async def _sweep_sessions_periodically(interval: float = 60.0):
+    """Evict ended and idle sessions from the in-memory store."""
+    while True:
+        await asyncio.sleep(interval)
+        removed = sweep_sessions()
+        if removed:
+            logger.info("Swept %d stale sessions.", removed)
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Load models on startup, cleanup on shutdown."""
     logger.info("Starting up — loading models...")
     agent.load_models()
     logger.info("Models loaded. Server ready.")
+    sweeper = asyncio.create_task(_sweep_sessions_periodically())
     yield
+    sweeper.cancel()
     logger.info("Shutting down.")
 
 
@@ -44,41 +56,102 @@ async def index():
     return HTMLResponse(content=index_file.read_text())
 
 
-def _webm_to_wav(webm_bytes: bytes) -> bytes:
-    """Convert WebM/Opus audio from the browser to WAV for Whisper.
+async def _send_json(ws: WebSocket, payload: dict):
+    """Send a JSON text frame, serialised with orjson."""
+    await ws.send_text(orjson.dumps(payload).decode())
 
-    Uses ffmpeg with temp files to avoid pipe/seek issues with WebM containers.
-    """
-    with tempfile.NamedTemporaryFile(suffix=".webm", delete=False) as tmp_in:
-        tmp_in.write(webm_bytes)
-        tmp_in_path = tmp_in.name
 
-    tmp_out_path = tmp_in_path.replace(".webm", ".wav")
-
-    try:
-        result = subprocess.run(
-            [
-                "ffmpeg", "-y",
-                "-i", tmp_in_path,
-                "-ac", "1",
-                "-ar", "16000",
-                "-sample_fmt", "s16",
-                "-f", "wav",
-                tmp_out_path,
-            ],
-            capture_output=True,
-            timeout=15,
-        )
-
-        if result.returncode != 0:
-            stderr = result.stderr.decode(errors="replace")
-            raise RuntimeError(f"ffmpeg failed (code {result.returncode}): {stderr[-300:]}")
-
-        return Path(tmp_out_path).read_bytes()
+def _webm_to_pcm(webm_bytes: bytes) -> np.ndarray:
+    """Decode WebM/Opus audio from the browser to PCM for Whisper.
 
-    finally:
-        Path(tmp_in_path).unlink(missing_ok=True)
-        Path(tmp_out_path).unlink(missing_ok=True)
+    Decoding and resampling run in-process through PyAV (libavformat,
+    libavcodec, libswresample) straight to mono 16 kHz float32 — exactly what
+    Whisper consumes — so no ffmpeg process is spawned per turn.
+    """
+    resampler = av.AudioResampler(format="flt", layout="mono", rate=16000)
+    chunks = []
+    with av.open(io.BytesIO(webm_bytes)) as container:
+        for frame in container.decode(audio=0):
+            chunks.extend(f.to_ndarray()[0] for f in resampler.resample(frame))
+    # Flush samples still buffered in the resampler
+    chunks.extend(f.to_ndarray()[0] for f in resampler.resample(None))
+
+    if not chunks:
+        raise RuntimeError("No audio frames decoded")
+    return np.concatenate(chunks)
+
+
+async def _stt_worker(ws: WebSocket, session: Session, stt_q: asyncio.Queue,
+                      llm_q: asyncio.Queue):
+    """Decode and transcribe uploads in arrival order, handing text to the LLM stage."""
+    while (audio_webm := await stt_q.get()) is not None:
+        try:
+            # Convert WebM from browser to 16 kHz float32 PCM
+            audio_pcm = await asyncio.to_thread(_webm_to_pcm, audio_webm)
+        except Exception as e:
+            logger.error("Audio conversion failed: %s", e)
+            await _send_json(ws, {
+                "type": "error",
+                "message": "Audio format conversion failed.",
+            })
+            continue
+
+        try:
+            result = await agent.transcribe(audio_pcm)
+        except Exception as e:
+            logger.error("Agent pipeline error: %s", e)
+            await _send_json(ws, {
+                "type": "error",
+                "message": "Processing error. Please try again.",
+            })
+            continue
+
+        if result is None:
+            await _send_json(ws, {"type": "transcription", "text": "", "language": ""})
+            continue
+
+        user_text, detected_lang = result
+        await _send_json(ws, {
+            "type": "transcription",
+            "text": user_text,
+            "language": detected_lang,
+        })
+        llm_q.put_nowait(result)
+
+    llm_q.put_nowait(None)
+
+
+async def _llm_worker(ws: WebSocket, session: Session, llm_q: asyncio.Queue,
+                      speech: tts.ParallelTTS):
+    """Generate replies turn by turn, streaming their chunks into the TTS queue."""
+    while (item := await llm_q.get()) is not None:
+        user_text, detected_lang = item
+        try:
+            response_text = await agent.respond(user_text, detected_lang, session, speech)
+        except Exception as e:
+            logger.error("Agent pipeline error: %s", e)
+            await _send_json(ws, {
+                "type": "error",
+                "message": "Processing error. Please try again.",
+            })
+            continue
+
+        await _send_json(ws, {"type": "response", "text": response_text})
+
+    speech.close()
+
+
+async def _tts_worker(ws: WebSocket, speech: tts.ParallelTTS):
+    """Stream synthesized audio to the client in reply order.
+
+    Each reply arrives as several binary WAV frames, followed by an
+    ``audio_end`` message once the whole reply has been sent.
+    """
+    async for audio in speech.results():
+        if audio is None:
+            await _send_json(ws, {"type": "audio_end"})
+        elif audio:
+            await ws.send_bytes(audio)
 
 
 @app.websocket("/ws/audio")
@@ -87,28 +160,44 @@ async def websocket_audio(ws: WebSocket):
     session: Session = create_session()
     logger.info("WebSocket connected — session %s", session.session_id)
 
-    await ws.send_json({
+    await _send_json(ws, {
         "type": "session_start",
         "session_id": session.session_id,
     })
 
+    # STT, LLM and TTS run as separate workers joined by queues, so the next
+    # turn is transcribed while the previous reply is still being generated
+    # or spoken. ``None`` flows down the queues to drain the pipeline.
+    stt_q: asyncio.Queue = asyncio.Queue()
+    llm_q: asyncio.Queue = asyncio.Queue()
+    speech = agent.start_speech()  # the TTS queue
+    workers = [
+        asyncio.create_task(_stt_worker(ws, session, stt_q, llm_q)),
+        asyncio.create_task(_llm_worker(ws, session, llm_q, speech)),
+        asyncio.create_task(_tts_worker(ws, speech)),
+    ]
+
     try:
         while True:
             message = await ws.receive()
 
             # Handle text messages (JSON commands)
             if "text" in message:
-                data = json.loads(message["text"])
+                data = orjson.loads(message["text"])
                 msg_type = data.get("type")
 
                 if msg_type == "end_session":
                     logger.info("End session requested — %s", session.session_id)
-                    result = agent.end_session(session)
-                    await ws.send_json({"type": "summary", **result})
+                    # Let in-flight turns finish before summarising
+                    stt_q.put_nowait(None)
+                    await asyncio.gather(*workers)
+                    # Blocking Gemini call; keep it off the event loop
+                    result = await asyncio.to_thread(agent.end_session, session)
+                    await _send_json(ws, {"type": "summary", **result})
                     break
 
                 if msg_type == "ping":
-                    await ws.send_json({"type": "pong"})
+                    await _send_json(ws, {"type": "pong"})
                     continue
 
             # Handle binary messages (audio data)
@@ -117,59 +206,19 @@ async def websocket_audio(ws: WebSocket):
                 if not audio_webm or len(audio_webm) < 1000:
                     # Skip empty or too-small chunks (corrupt/incomplete WebM)
                     logger.debug("Skipping tiny audio chunk (%d bytes)", len(audio_webm) if audio_webm else 0)
-                    await ws.send_json({"type": "transcription", "text": "", "language": ""})
+                    await _send_json(ws, {"type": "transcription", "text": "", "language": ""})
                     continue
 
-                try:
-                    # Convert WebM from browser to WAV
-                    audio_wav = _webm_to_wav(audio_webm)
-                except Exception as e:
-                    logger.error("Audio conversion failed: %s", e)
-                    await ws.send_json({
-                        "type": "error",
-                        "message": "Audio format conversion failed.",
-                    })
-                    continue
-
-                # Run agent pipeline
-                try:
-                    result = await agent.process_audio(audio_wav, session)
-                except Exception as e:
-                    logger.error("Agent pipeline error: %s", e)
-                    await ws.send_json({
-                        "type": "error",
-                        "message": "Processing error. Please try again.",
-                    })
-                    continue
-
-                if result is None:
-                    await ws.send_json({
-                        "type": "transcription",
-                        "text": "",
-                        "language": "",
-                    })
-                    continue
-
-                # Send transcription
-                await ws.send_json({
-                    "type": "transcription",
-                    "text": result.user_text,
-                    "language": result.detected_language,
-                })
-
-                # Send response text
-                await ws.send_json({
-                    "type": "response",
-                    "text": result.response_text,
-                })
-
-                # Send audio response as binary
-                await ws.send_bytes(result.audio_bytes)
+                stt_q.put_nowait(audio_webm)
 
     except WebSocketDisconnect:
         logger.info("WebSocket disconnected — session %s", session.session_id)
     except Exception as e:
         logger.error("WebSocket error: %s", e)
     finally:
+        for worker in workers:
+            worker.cancel()
+        speech.cancel()
         if not session.ended:
             session.end()
+        remove_session(session.session_id)
@@ -1,9 +1,12 @@
 """Conversation session manager."""
 
+import secrets
 import time
-import uuid
+from collections import OrderedDict
 from dataclasses import dataclass, field
-from typing import Dict, List, Optional
+from typing import Any, Dict, List, Optional
+
+from src import config
 
 
 @dataclass
@@ -16,18 +19,23 @@ class Turn:
 
 @dataclass
 class Session:
-    session_id: str = field(default_factory=lambda: uuid.uuid4().hex[:12])
+    session_id: str = field(default_factory=lambda: secrets.token_hex(6))
     turns: List[Turn] = field(default_factory=list)
     created_at: float = field(default_factory=time.time)
     ended: bool = False
     summary: Optional[str] = None
     sentiment: Optional[dict] = None
+    gemini_chat: Optional[Any] = None  # live Gemini ChatSession, see llm.stream_response
 
     def add_turn(self, role: str, text: str, language: str):
         self.turns.append(Turn(role=role, text=text, language=language))
 
     def get_history(self) -> List[Dict[str, str]]:
-        """Return history in the format expected by the LLM."""
+        """Return the full history in the format expected by the LLM.
+
+        This grows with the conversation; callers building a prompt should
+        keep only a recent window (see ``llm.history_window``).
+        """
         return [{"role": t.role, "text": t.text} for t in self.turns]
 
     def last_activity(self) -> float:
@@ -39,19 +47,38 @@ class Session:
         self.ended = True
 
 
-# In-memory session store
-_sessions: Dict[str, Session] = {}
+# In-memory session store, least recently used first
+_sessions: "OrderedDict[str, Session]" = OrderedDict()
 
 
 def create_session() -> Session:
     session = Session()
     _sessions[session.session_id] = session
+    max_sessions = config.get("session.max_sessions", 10_000)
+    while len(_sessions) > max_sessions:
+        _sessions.popitem(last=False)
     return session
 
 
 def get_session(session_id: str) -> Optional[Session]:
-    return _sessions.get(session_id)
+    session = _sessions.get(session_id)
+    if session is not None:
+        _sessions.move_to_end(session_id)
+    return session
 
 
 def remove_session(session_id: str):
     _sessions.pop(session_id, None)
+
+
+def sweep_sessions() -> int:
+    """Drop ended sessions and ones idle longer than ``session.idle_timeout_seconds``.
+
+    Returns:
+        The number of sessions removed.
+    """
+    cutoff = time.time() - config.get("session.idle_timeout_seconds", 300)
+    stale = [sid for sid, s in _sessions.items() if s.ended or s.last_activity() < cutoff]
+    for sid in stale:
+        del _sessions[sid]
+    return len(stale)
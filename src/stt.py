@@ -1,91 +1,206 @@
 """Speech-to-Text engine using faster-whisper."""
 
-import io
+import asyncio
+import inspect
 import logging
-from typing import Tuple
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Tuple
 
+import ctranslate2
 import numpy as np
-import soundfile as sf
 from faster_whisper import WhisperModel
+from faster_whisper.transcribe import Segment
 
 from src import config
 
 logger = logging.getLogger(__name__)
 
 _model: WhisperModel | None = None
+_model_lock = threading.Lock()
+
+# Whisper runs on one dedicated thread: the event loop stays free, and
+# concurrent sessions queue for the single model instead of contending for it.
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="whisper")
+
+# Greedy decoding: beam search multiplies decoder work by beam_size for little
+# gain on short conversational turns.
+_GREEDY = dict(beam_size=1, best_of=1, temperature=0.0, condition_on_previous_text=False)
+_LOW_CONFIDENCE_LOGPROB = -1.0
+
+# Segments above this no-speech probability are treated as silence/noise
+_NO_SPEECH_PROB = 0.6
+
+
+def _resolve_device() -> Tuple[str, str]:
+    """Resolve 'auto' device / compute type to what this machine supports."""
+    device = config.get("stt.device", "auto")
+    compute_type = config.get("stt.compute_type", "auto")
+    if device == "auto":
+        device = "cuda" if ctranslate2.get_cuda_device_count() > 0 else "cpu"
+    if compute_type == "auto":
+        # INT8 weights halve memory traffic; GPUs keep float16 activations
+        compute_type = "int8_float16" if device == "cuda" else "int8"
+    return device, compute_type
+
+
+class _TorchFeatureExtractor:
+    """Computes Whisper's log-mel spectrogram on the GPU with torch.
+
+    Wraps faster-whisper's CPU feature extractor: attributes are delegated to
+    it, and it is called instead whenever the GPU path fails. With
+    ``stt.clear_cache_per_call`` on, torch's cached blocks are released after
+    every call for CTranslate2 to use, at the cost of reallocating them on the
+    next clip.
+    """
+
+    def __init__(self, cpu_extractor, torch_module):
+        self._cpu = cpu_extractor
+        self._torch = torch_module
+        # faster-whisper calls the extractor without ``padding`` and relies on its
+        # default, which differs between versions (True in 1.0, 160 in 1.1+)
+        param = inspect.signature(cpu_extractor.__call__).parameters.get("padding")
+        self._default_padding = 160 if param is None else param.default
+        self._clear_cache = config.get("stt.clear_cache_per_call", False)
+        self._window = torch_module.hann_window(cpu_extractor.n_fft, device="cuda")
+        self._filters = torch_module.as_tensor(
+            np.asarray(cpu_extractor.mel_filters, dtype=np.float32), device="cuda"
+        )
+
+    def __getattr__(self, name):
+        return getattr(self._cpu, name)
+
+    def __call__(self, waveform: np.ndarray, padding=None, chunk_length=None, **kwargs):
+        if padding is None:
+            padding = self._default_padding
+        try:
+            return self._log_mel(waveform, padding, chunk_length)
+        except Exception as e:
+            logger.warning("GPU feature extraction failed, using CPU: %s", e)
+            return self._cpu(waveform, padding=padding, chunk_length=chunk_length, **kwargs)
+        finally:
+            if self._clear_cache:
+                self._torch.cuda.empty_cache()
+
+    def _log_mel(self, waveform: np.ndarray, padding, chunk_length) -> np.ndarray:
+        torch = self._torch
+        cpu = self._cpu
+        if chunk_length is not None:
+            cpu.n_samples = chunk_length * cpu.sampling_rate
+            cpu.nb_max_frames = cpu.n_samples // cpu.hop_length
+        # faster-whisper 1.0 pads with a bool (True = a full window), 1.1+ with a sample count
+        if isinstance(padding, bool):
+            padding = cpu.n_samples if padding else 0
+
+        with torch.inference_mode():
+            audio = torch.as_tensor(np.asarray(waveform, dtype=np.float32), device="cuda")
+            if padding:
+                audio = torch.nn.functional.pad(audio, (0, int(padding)))
+            stft = torch.stft(audio, cpu.n_fft, cpu.hop_length, window=self._window,
+                              return_complex=True)
+            # Each step after the matmul reuses its buffer instead of allocating a new one
+            magnitudes = stft[..., :-1].abs().square_()
+            log_spec = (self._filters @ magnitudes).clamp_(min=1e-10).log10_()
+            log_spec = torch.maximum(log_spec, log_spec.max() - 8.0, out=log_spec)
+            log_spec.add_(4.0).div_(4.0)
+            return log_spec.cpu().numpy()
+
+
+def _use_gpu_features(model: WhisperModel):
+    """Move mel-spectrogram computation to the GPU when torch can reach one."""
+    try:
+        # Imported here so CPU-only hosts never load torch
+        import torch
+        if not torch.cuda.is_available():
+            return
+        model.feature_extractor = _TorchFeatureExtractor(model.feature_extractor, torch)
+        logger.info("Whisper features computed on GPU.")
+    except Exception as e:
+        logger.warning("GPU feature extraction unavailable, using CPU: %s", e)
 
 
 def _get_model() -> WhisperModel:
     global _model
-    if _model is None:
-        model_size = config.get("stt.model_size", "small")
-        device = config.get("stt.device", "cuda")
-        compute_type = config.get("stt.compute_type", "float16")
-        logger.info("Loading Whisper model: %s on %s (%s)", model_size, device, compute_type)
-        _model = WhisperModel(model_size, device=device, compute_type=compute_type)
-        logger.info("Whisper model loaded.")
+    if _model is not None:
+        return _model
+    # Called from startup and the Whisper thread; load the model only once
+    with _model_lock:
+        if _model is None:
+            model_size = config.get("stt.model_size", "small")
+            device, compute_type = _resolve_device()
+            logger.info("Loading Whisper model: %s on %s (%s)", model_size, device, compute_type)
+            model = WhisperModel(model_size, device=device, compute_type=compute_type)
+            if device == "cuda" and config.get("stt.gpu_features", True):
+                _use_gpu_features(model)
+            _model = model
+            logger.info("Whisper model loaded.")
     return _model
 
 
+def _warmup(model: WhisperModel):
+    """Run one throwaway transcription so CUDA kernels and buffers are ready before the first user."""
+    try:
+        segments, _ = model.transcribe(np.zeros(16000, dtype=np.float32), vad_filter=False, **_GREEDY)
+        list(segments)
+        logger.info("Whisper warmed up.")
+    except Exception as e:
+        logger.warning("Whisper warm-up failed: %s", e)
+
+
 def load():
-    """Pre-load the Whisper model at startup."""
-    _get_model()
+    """Pre-load (and by default warm up) the Whisper model at startup."""
+    model = _get_model()
+    if config.get("stt.warmup", True):
+        _warmup(model)
+
+
+def _mean_logprob(segments: List[Segment]) -> float:
+    return sum(seg.avg_logprob for seg in segments) / len(segments)
 
 
-def transcribe(audio_bytes: bytes) -> Tuple[str, str]:
-    """Transcribe audio bytes to text.
+def transcribe_pcm(audio_data: np.ndarray, language: Optional[str] = None) -> Tuple[str, str]:
+    """Transcribe mono 16 kHz float32 samples to text.
+
+    Decoding is greedy and runs once over the whole clip; silence and noise
+    are dropped afterwards per segment instead of by a VAD pre-pass, so the
+    encoder never has to run twice on the same audio. Beam search only runs
+    as a fallback when the greedy result is low-confidence; that fallback
+    always re-detects the language. A ``language`` hint is echoed back as the
+    detected language.
 
     Args:
-        audio_bytes: WAV-format audio data.
+        audio_data: 1-D float32 array at 16 kHz, as Whisper expects.
+        language: Expected language code; skips Whisper's language detection.
 
     Returns:
         (transcribed_text, detected_language_code)
-        Language codes: 'en', 'fr', 'id', etc.
     """
     model = _get_model()
 
-    buf = io.BytesIO(audio_bytes)
-    audio_data, sample_rate = sf.read(buf, dtype="float32")
-
-    # Convert stereo to mono if needed
-    if audio_data.ndim > 1:
-        audio_data = audio_data.mean(axis=1)
-
-    # Resample to 16kHz if needed (Whisper expects 16kHz)
-    if sample_rate != 16000:
-        from scipy import signal
-        num_samples = int(len(audio_data) * 16000 / sample_rate)
-        audio_data = signal.resample(audio_data, num_samples)
-
-    # First attempt with VAD filter (lower threshold for browser audio)
-    segments, info = model.transcribe(
-        audio_data,
-        beam_size=5,
-        vad_filter=True,
-        vad_parameters=dict(
-            threshold=0.3,
-            min_silence_duration_ms=600,
-            min_speech_duration_ms=100,
-            speech_pad_ms=400,
-        ),
-    )
-
-    text_parts = []
-    for segment in segments:
-        text_parts.append(segment.text.strip())
-
-    full_text = " ".join(text_parts).strip()
-
-    # If VAD filtered everything out, retry without VAD
-    if not full_text:
-        logger.info("VAD filtered all audio, retrying without VAD filter")
+    segments, info = model.transcribe(audio_data, language=language, vad_filter=False, **_GREEDY)
+    segments = list(segments)
+
+    if segments and _mean_logprob(segments) < _LOW_CONFIDENCE_LOGPROB:
+        logger.info("Low-confidence greedy transcript, retrying with beam search")
         segments, info = model.transcribe(audio_data, beam_size=5, vad_filter=False)
-        text_parts = []
-        for segment in segments:
-            text_parts.append(segment.text.strip())
-        full_text = " ".join(text_parts).strip()
+        segments = list(segments)
+
+    speech = [
+        seg for seg in segments
+        if seg.no_speech_prob < _NO_SPEECH_PROB and seg.avg_logprob > _LOW_CONFIDENCE_LOGPROB
+    ]
+    # If the filter rejected everything, keep what Whisper heard rather than decode again
+    if not speech:
+        speech = segments
 
+    full_text = " ".join(seg.text.strip() for seg in speech).strip()
     detected_lang = info.language or "en"
 
     logger.info("STT: [%s] %s", detected_lang, full_text)
     return full_text, detected_lang
+
+
+async def transcribe_pcm_async(audio_data: np.ndarray, language: Optional[str] = None) -> Tuple[str, str]:
+    """Run :func:`transcribe_pcm` on the Whisper thread without blocking the event loop."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, transcribe_pcm, audio_data, language)
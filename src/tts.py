@@ -1,9 +1,18 @@
 """Text-to-Speech engine using Gemini TTS (gemini-2.5-flash-preview-tts)."""
 
-import io
+import asyncio
+import functools
+import hashlib
 import logging
-import wave
+import struct
+import tempfile
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import AsyncIterator, List, Optional, Set
 
+import numpy as np
+import soxr
 from google import genai
 from google.genai import types
 
@@ -13,6 +22,23 @@ logger = logging.getLogger(__name__)
 
 _client: genai.Client | None = None
 
+_TURN_END = object()
+
+_WAV_HEADER_SIZE = 44
+
+# Gemini TTS always returns 24 kHz audio, whatever tts.sample_rate asks for
+_GEMINI_SAMPLE_RATE = 24000
+
+# Synthesized PCM by cache key, least recently used first; backed by WAV
+# files under tts.cache_dir (at most tts.cache_max_files, least recently used
+# evicted) so repeated phrases survive restarts.
+_pcm_cache: "OrderedDict[str, bytes]" = OrderedDict()
+
+# WAV files under tts.cache_dir: counted once, then tracked per write so the
+# directory is only scanned when it actually needs pruning.
+_disk_count: int | None = None
+_disk_lock = threading.Lock()
+
 
 def _get_client() -> genai.Client:
     """Lazy-init the Gemini genai client."""
@@ -22,69 +48,326 @@ def _get_client() -> genai.Client:
     return _client
 
 
-def _pcm_to_wav(pcm_data: bytes, sample_rate: int = 24000,
+def _wav_header(data_size: int, sample_rate: int = 24000,
                 num_channels: int = 1, sample_width: int = 2) -> bytes:
-    """Wrap raw PCM bytes in a WAV header."""
-    buf = io.BytesIO()
-    with wave.open(buf, "wb") as wf:
-        wf.setnchannels(num_channels)
-        wf.setsampwidth(sample_width)
-        wf.setframerate(sample_rate)
-        wf.writeframes(pcm_data)
-    return buf.getvalue()
+    """Return the 44-byte RIFF/WAVE header for ``data_size`` bytes of PCM."""
+    block_align = num_channels * sample_width
+    return struct.pack(
+        "<4sI4s4sIHHIIHH4sI",
+        b"RIFF", 36 + data_size, b"WAVE",
+        b"fmt ", 16, 1, num_channels, sample_rate,
+        sample_rate * block_align, block_align, sample_width * 8,
+        b"data", data_size,
+    )
+
+
+def _pcm_to_wav(pcm_data: bytes, sample_rate: int = 24000) -> bytes:
+    """Wrap raw PCM bytes in a 44-byte RIFF/WAVE header."""
+    return _wav_header(len(pcm_data), sample_rate) + pcm_data
+
+
+def _cache_key(text: str) -> str:
+    settings = config.settings()
+    key = f"{settings.tts_model}|{settings.tts_voice_name}|{settings.tts_sample_rate}|{text}"
+    return hashlib.sha1(key.encode()).hexdigest()
+
+
+def _cache_dir() -> Optional[Path]:
+    return config.settings().tts_cache_dir
+
+
+def _read_disk_cache(key: str) -> Optional[bytes]:
+    """Return the PCM stored for ``key`` on disk, or None."""
+    cache_dir = _cache_dir()
+    if cache_dir is None:
+        return None
+    path = cache_dir / f"{key}.wav"
+    try:
+        with open(path, "rb") as f:
+            # Skip the header on read instead of slicing a copy of the whole file
+            f.seek(_WAV_HEADER_SIZE)
+            pcm = f.read()
+        path.touch()  # mtime is the recency used for eviction
+        return pcm
+    except OSError:
+        return None
+
+
+def _mtime(path: Path) -> float:
+    try:
+        return path.stat().st_mtime
+    except FileNotFoundError:
+        return 0.0
+
+
+def _prune_disk_cache(cache_dir: Path, max_files: int) -> int:
+    """Delete the least recently used WAV files beyond ``max_files``; return how many remain."""
+    paths = list(cache_dir.glob("*.wav"))
+    excess = len(paths) - max_files
+    if excess <= 0:
+        return len(paths)
+    paths.sort(key=_mtime)
+    for path in paths[:excess]:
+        path.unlink(missing_ok=True)
+    return max_files
+
+
+def _count_disk_write(cache_dir: Path):
+    """Track a new cache file, pruning once the count is a tenth over the cap."""
+    global _disk_count
+    max_files = config.settings().tts_cache_max_files
+    with _disk_lock:
+        if _disk_count is None:
+            _disk_count = sum(1 for _ in cache_dir.glob("*.wav"))
+        else:
+            _disk_count += 1
+        if _disk_count > max_files + max_files // 10:
+            _disk_count = _prune_disk_cache(cache_dir, max_files)
+
+
+def _write_disk_cache(key: str, pcm: bytes, sample_rate: int):
+    cache_dir = _cache_dir()
+    if cache_dir is None:
+        return
+    try:
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        # Write then rename so readers never see a torn file
+        with tempfile.NamedTemporaryFile(dir=cache_dir, suffix=".tmp", delete=False) as tmp:
+            # Header and PCM written separately: no concatenated copy of the audio
+            tmp.write(_wav_header(len(pcm), sample_rate))
+            tmp.write(pcm)
+        Path(tmp.name).replace(cache_dir / f"{key}.wav")
+        _count_disk_write(cache_dir)
+    except OSError as e:
+        logger.warning("Could not write TTS cache entry %s: %s", key, e)
+
+
+def _remember(key: str, pcm: bytes):
+    _pcm_cache[key] = pcm
+    _pcm_cache.move_to_end(key)
+    while len(_pcm_cache) > config.settings().tts_cache_size:
+        _pcm_cache.popitem(last=False)
+
+
+async def _load_cached(key: str) -> Optional[bytes]:
+    """Return cached PCM for ``key`` from memory, else disk, else None."""
+    pcm = _pcm_cache.get(key)
+    if pcm is not None:
+        _pcm_cache.move_to_end(key)
+        return pcm
+    pcm = await asyncio.to_thread(_read_disk_cache, key)
+    if pcm is None:
+        return None
+    _remember(key, pcm)
+    return pcm
+
+
+def _store_cached(key: str, pcm: bytes):
+    """Cache ``pcm`` in memory now and as a WAV file in the background."""
+    _remember(key, pcm)
+    asyncio.get_running_loop().run_in_executor(
+        None, _write_disk_cache, key, pcm, config.settings().tts_sample_rate
+    )
+
+
+def clear_cache():
+    """Drop all cached TTS audio, in memory and on disk."""
+    global _disk_count
+    _pcm_cache.clear()
+    _disk_count = None
+    cache_dir = _cache_dir()
+    if cache_dir is not None and cache_dir.is_dir():
+        for path in cache_dir.glob("*.wav"):
+            path.unlink(missing_ok=True)
+
+
+@functools.lru_cache(maxsize=None)
+def _generate_config(voice_name: str) -> types.GenerateContentConfig:
+    """Request config for ``voice_name``, built once instead of per chunk."""
+    return types.GenerateContentConfig(
+        response_modalities=["AUDIO"],
+        speech_config=types.SpeechConfig(
+            voice_config=types.VoiceConfig(
+                prebuilt_voice_config=types.PrebuiltVoiceConfig(voice_name=voice_name),
+            ),
+        ),
+    )
 
 
 def load():
     """Initialise the Gemini TTS client and log readiness."""
     _get_client()
-    model = config.get("tts.model", "gemini-2.5-flash-preview-tts")
-    voice = config.get("tts.voice_name", "Kore")
-    logger.info("TTS ready (Gemini %s, voice=%s).", model, voice)
+    settings = config.settings()
+    logger.info("TTS ready (Gemini %s, voice=%s).", settings.tts_model, settings.tts_voice_name)
 
 
-async def synthesize(text: str, detected_language: str = "fr") -> bytes:
-    """Synthesize text to WAV audio bytes using Gemini TTS.
+async def _stream_pcm(text: str, detected_language: str) -> AsyncIterator[bytes]:
+    """Yield raw PCM (24 kHz mono 16-bit) from Gemini TTS as it arrives.
 
-    Args:
-        text: The text to speak.
-        detected_language: The detected language code (unused — voice is fixed in config).
-
-    Returns:
-        WAV-format audio bytes (PCM 24 kHz mono 16-bit).
+    Chunks are trimmed to whole samples; a dangling byte is carried into the
+    next chunk.
     """
     client = _get_client()
-    model = config.get("tts.model", "gemini-2.5-flash-preview-tts")
-    voice_name = config.get("tts.voice_name", "Kore")
-    sample_rate = config.get("tts.sample_rate", 24000)
+    settings = config.settings()
 
-    logger.info("TTS: model=%s, voice=%s, lang=%s", model, voice_name, detected_language)
+    logger.info("TTS: model=%s, voice=%s, lang=%s",
+                settings.tts_model, settings.tts_voice_name, detected_language)
 
-    response = await client.aio.models.generate_content(
-        model=model,
+    stream = await client.aio.models.generate_content_stream(
+        model=settings.tts_model,
         contents=f"Say: {text}",
-        config=types.GenerateContentConfig(
-            response_modalities=["AUDIO"],
-            speech_config=types.SpeechConfig(
-                voice_config=types.VoiceConfig(
-                    prebuilt_voice_config=types.PrebuiltVoiceConfig(
-                        voice_name=voice_name,
-                    ),
-                ),
-            ),
-        ),
+        config=_generate_config(settings.tts_voice_name),
     )
 
-    if (not response.candidates
-            or not response.candidates[0].content
-            or not response.candidates[0].content.parts):
+    pending = b""
+    produced = False
+    async for response in stream:
+        if (not response.candidates
+                or not response.candidates[0].content
+                or not response.candidates[0].content.parts):
+            continue
+        # Usually one even-length part: join and the slice below then return it uncopied
+        data = b"".join(part.inline_data.data for part in response.candidates[0].content.parts
+                        if part.inline_data and part.inline_data.data)
+        if pending:
+            data = pending + data
+        whole = len(data) - len(data) % 2
+        if whole:
+            produced = True
+            yield data if whole == len(data) else data[:whole]
+        pending = data[whole:]
+
+    if not produced:
         logger.warning("TTS produced no audio for text: %s", text[:80])
-        return b""
 
-    part = response.candidates[0].content.parts[0]
-    pcm_data = part.inline_data.data
-    if not pcm_data:
-        logger.warning("TTS returned empty audio data for text: %s", text[:80])
-        return b""
 
-    wav_bytes = _pcm_to_wav(pcm_data, sample_rate=sample_rate)
-    return wav_bytes
+async def _resampled(pcm_stream: AsyncIterator[bytes], sample_rate: int) -> AsyncIterator[bytes]:
+    """Convert a stream of 24 kHz PCM chunks to ``sample_rate``, passing it through if equal.
+
+    One soxr stream spans all chunks, so there are no clicks at chunk joins.
+    """
+    if sample_rate == _GEMINI_SAMPLE_RATE:
+        async for pcm_data in pcm_stream:
+            yield pcm_data
+        return
+
+    resampler = soxr.ResampleStream(_GEMINI_SAMPLE_RATE, sample_rate, 1, dtype="int16")
+    async for pcm_data in pcm_stream:
+        out = resampler.resample_chunk(np.frombuffer(pcm_data, dtype="<i2"))
+        if out.size:
+            yield out.tobytes()
+    tail = resampler.resample_chunk(np.empty(0, dtype=np.int16), last=True)
+    if tail.size:
+        yield tail.tobytes()
+
+
+async def _synthesize_pcm(text: str, detected_language: str) -> AsyncIterator[bytes]:
+    """Yield PCM at ``tts.sample_rate`` for ``text``, from the cache when possible, caching it otherwise."""
+    key = _cache_key(text)
+    cached = await _load_cached(key)
+    if cached is not None:
+        yield cached
+        return
+
+    pcm_parts: List[bytes] = []
+    sample_rate = config.settings().tts_sample_rate
+    async for pcm_data in _resampled(_stream_pcm(text, detected_language), sample_rate):
+        pcm_parts.append(pcm_data)
+        yield pcm_data
+
+    if pcm_parts:
+        _store_cached(key, b"".join(pcm_parts))
+
+
+async def synthesize_stream(text: str, detected_language: str = "fr") -> AsyncIterator[bytes]:
+    """Synthesize text with Gemini TTS, yielding audio as it is generated.
+
+    Args:
+        text: The text to speak.
+        detected_language: The detected language code (unused — voice is fixed in config).
+
+    Yields:
+        Self-contained WAV chunks (mono 16-bit PCM at ``tts.sample_rate``) that play back
+        seamlessly when queued one after another. Previously synthesized
+        text is served from the cache as a single chunk.
+    """
+    sample_rate = config.settings().tts_sample_rate
+    async for pcm_data in _synthesize_pcm(text, detected_language):
+        yield _pcm_to_wav(pcm_data, sample_rate=sample_rate)
+
+
+class ParallelTTS:
+    """Synthesize text chunks concurrently, delivering audio in submission order.
+
+    Gemini TTS is network-bound, so overlapping a few requests hides most of
+    their latency. At most ``concurrency`` syntheses run at once
+    (``tts.concurrency`` in config by default). Each submission's audio is
+    streamed through as it arrives, but never before every earlier
+    submission's audio has been delivered. One instance serves a whole
+    connection: it is the queue between the LLM stage and the audio sender.
+    """
+
+    def __init__(self, language: str = "fr", concurrency: Optional[int] = None):
+        if concurrency is None:
+            concurrency = config.settings().tts_concurrency
+        self._language = language
+        self._sem = asyncio.Semaphore(concurrency)
+        # One chunk queue per submission, or None (closed) / _TURN_END markers
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._tasks: Set[asyncio.Task] = set()  # in flight
+
+    async def _run(self, text: str, chunks: asyncio.Queue) -> List[bytes]:
+        audio: List[bytes] = []
+        try:
+            async with self._sem:
+                async for wav in synthesize_stream(text, self._language):
+                    audio.append(wav)
+                    chunks.put_nowait(wav)
+        except Exception as e:
+            # A failed chunk is skipped rather than stalling every chunk after it
+            logger.error("TTS failed for text %r: %s", text[:80], e)
+            audio = []
+        finally:
+            chunks.put_nowait(None)
+        return audio
+
+    def submit(self, text: str) -> asyncio.Task:
+        """Start synthesizing ``text``; its audio is delivered after all earlier submissions.
+
+        The returned task resolves to the list of WAV chunks produced (empty on failure).
+        """
+        chunks: asyncio.Queue = asyncio.Queue()
+        task = asyncio.create_task(self._run(text, chunks))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        self._queue.put_nowait(chunks)
+        return task
+
+    def submit_audio(self, audio: bytes):
+        """Queue already-synthesized audio behind all earlier submissions."""
+        chunks: asyncio.Queue = asyncio.Queue()
+        chunks.put_nowait(audio)
+        chunks.put_nowait(None)
+        self._queue.put_nowait(chunks)
+
+    def end_turn(self):
+        """Mark the end of a reply; :meth:`results` yields ``None`` at this point."""
+        self._queue.put_nowait(_TURN_END)
+
+    def close(self):
+        """Signal that no more chunks will be submitted."""
+        self._queue.put_nowait(None)
+
+    async def results(self) -> AsyncIterator[Optional[bytes]]:
+        """Yield WAV chunks in submission order until closed, and ``None`` at each turn end."""
+        while (chunks := await self._queue.get()) is not None:
+            if chunks is _TURN_END:
+                yield None
+                continue
+            while (audio := await chunks.get()) is not None:
+                yield audio
+
+    def cancel(self):
+        """Cancel any synthesis still in flight."""
+        for task in list(self._tasks):
+            task.cancel()
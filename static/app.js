@@ -25,6 +25,10 @@
   let recordStartTime = 0;
   let audioCtx = null;
   let sessionActive = false;
+  let playbackChain = Promise.resolve(); // decodes chunks in arrival order
+  let playbackTime = 0;                  // audio clock time the next chunk starts at
+  let pendingChunks = 0;                 // chunks queued or playing
+  let awaitingAudio = false;             // reply audio still streaming in
 
   const MIN_RECORD_MS = 600; // minimum recording duration
 
@@ -68,6 +72,7 @@
 
       case "transcription":
         if (msg.text) {
+          awaitingAudio = true;
           addMessage("user", msg.text, msg.language);
           langBadge.textContent = (msg.language || "--").toUpperCase();
         } else {
@@ -79,7 +84,12 @@
 
       case "response":
         addMessage("agent", msg.text);
-        showProcessing("Speaking...");
+        break;
+
+      case "audio_end":
+        // The whole reply has been sent; finish once the last chunk has played
+        awaitingAudio = false;
+        finishPlaybackIfIdle();
         break;
 
       case "summary":
@@ -88,6 +98,7 @@
         break;
 
       case "error":
+        awaitingAudio = false;
         hideProcessing();
         addMessage("agent", `Error: ${msg.message}`);
         setStatus("connected", "Connected");
@@ -202,18 +213,25 @@
     return audioCtx;
   }
 
+  // Replies stream in as many small WAV chunks; schedule them back-to-back on
+  // the audio clock so playback is gapless and in order.
   function playAudio(arrayBuffer) {
     const ctx = ensureAudioCtx();
 
     isPlaying = true;
+    pendingChunks++;
+    showProcessing("Speaking...");
 
-    ctx.decodeAudioData(arrayBuffer.slice(0))
+    playbackChain = playbackChain
+      .then(() => ctx.decodeAudioData(arrayBuffer.slice(0)))
       .then((buffer) => {
         const source = ctx.createBufferSource();
         source.buffer = buffer;
         source.connect(ctx.destination);
-        source.onended = () => { isPlaying = false; hideProcessing(); };
-        source.start(0);
+        source.onended = onChunkEnded;
+        const startAt = Math.max(ctx.currentTime, playbackTime);
+        source.start(startAt);
+        playbackTime = startAt + buffer.duration;
       })
       .catch((err) => {
         console.error("Audio decode error:", err);
@@ -221,6 +239,18 @@
       });
   }
 
+  function onChunkEnded() {
+    pendingChunks = Math.max(0, pendingChunks - 1);
+    finishPlaybackIfIdle();
+  }
+
+  function finishPlaybackIfIdle() {
+    if (pendingChunks === 0 && !awaitingAudio) {
+      isPlaying = false;
+      hideProcessing();
+    }
+  }
+
   function playAudioFallback(arrayBuffer) {
     try {
       const blob = new Blob([arrayBuffer], { type: "audio/wav" });
@@ -228,18 +258,16 @@
       const audio = new Audio(url);
       audio.onended = () => {
         URL.revokeObjectURL(url);
-        isPlaying = false;
-        hideProcessing();
+        onChunkEnded();
       };
       audio.onerror = () => {
         URL.revokeObjectURL(url);
-        isPlaying = false;
-        hideProcessing();
+        onChunkEnded();
       };
-      audio.play().catch(() => { isPlaying = false; hideProcessing(); });
+      audio.play().catch(() => onChunkEnded());
     } catch (e) {
       console.error("Fallback audio playback failed:", e);
-      hideProcessing();
+      onChunkEnded();
     }
   }
 